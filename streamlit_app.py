@@ -18,10 +18,13 @@ Ejecución:
 """
 
 import streamlit as st
-import csv
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 import os
-from typing import List, Dict
+from functools import lru_cache
+from uuid import uuid4
 
 # Configuración de la página
 st.set_page_config(
@@ -33,6 +36,7 @@ st.set_page_config(
 
 # Constantes
 # Detectar automáticamente la ruta correcta del CSV
+@lru_cache(maxsize=1)
 def obtener_ruta_csv():
     """Obtiene la ruta correcta del CSV independientemente de desde dónde se ejecute."""
     rutas_posibles = [
@@ -46,10 +50,45 @@ def obtener_ruta_csv():
     return "../datos/tienda_aurelion.csv"  # Por defecto
 
 ARCHIVO_CSV = obtener_ruta_csv()
+# Almacenamiento principal en Parquet: conserva los tipos de datos y carga
+# mucho más rápido que el CSV (que se mantiene solo como formato de origen).
+# Es un directorio de dataset: agregar un producto escribe un fragmento
+# nuevo en lugar de reescribir todas las filas.
+ARCHIVO_PARQUET = os.path.splitext(ARCHIVO_CSV)[0] + ".parquet"
+COLUMNAS = ['id', 'nombre', 'categoria', 'precio', 'stock', 'descripcion', 'proveedor']
+# Tipos declarados al parsear el CSV: evita los casts posteriores columna a
+# columna, usa enteros de 32 bits (sobran para precio/stock) y representa
+# categoria/proveedor como categóricos (códigos enteros + diccionario).
+DTYPES_CSV = {
+    'id': 'int32',
+    'precio': 'int32',
+    'stock': 'int32',
+    'nombre': 'string',
+    'categoria': 'category',
+    'proveedor': 'category',
+    'descripcion': 'string',
+}
+# Esquema fijo del dataset: todos los fragmentos se escriben con estos
+# tipos para que puedan leerse juntos sin conflictos
+ESQUEMA_PARQUET = pa.schema([
+    ('id', pa.int32()),
+    ('nombre', pa.string()),
+    ('categoria', pa.string()),
+    ('precio', pa.int32()),
+    ('stock', pa.int32()),
+    ('descripcion', pa.string()),
+    ('proveedor', pa.string()),
+])
 UMBRAL_STOCK_BAJO = 20
 
 # Estilos CSS personalizados
-st.markdown("""
+@st.cache_resource
+def _inyectar_css():
+    """
+    Inyecta la hoja de estilos una sola vez; en los reruns siguientes
+    Streamlit reproduce el elemento cacheado sin reenviar el bloque.
+    """
+    st.markdown("""
 <style>
     .main-header {
         font-size: 3rem;
@@ -78,19 +117,78 @@ st.markdown("""
     }
 </style>
 """, unsafe_allow_html=True)
+    return True
+
+
+def _df_a_tabla(df: pd.DataFrame) -> pa.Table:
+    """Convierte el DataFrame al esquema fijo del dataset Parquet."""
+    tabla = pa.Table.from_pandas(df[COLUMNAS], preserve_index=False)
+    return tabla.cast(ESQUEMA_PARQUET)
+
+
+def _escribir_dataset(tabla: pa.Table, comportamiento: str):
+    """Escribe una tabla como fragmento(s) del dataset Parquet."""
+    try:
+        version_anterior = os.stat(ARCHIVO_PARQUET).st_mtime_ns
+    except FileNotFoundError:
+        version_anterior = 0
+    ds.write_dataset(
+        tabla,
+        ARCHIVO_PARQUET,
+        format="parquet",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        basename_template=f"parte-{uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior=comportamiento,
+    )
+    # La versión de los datos es el mtime del directorio: forzar que avance
+    # estrictamente en cada escritura, para que las cachés derivadas jamás
+    # confundan la versión nueva con una anterior aunque el reloj del
+    # sistema de archivos sea de resolución gruesa
+    if os.stat(ARCHIVO_PARQUET).st_mtime_ns <= version_anterior:
+        version_nueva = version_anterior + 1
+        os.utime(ARCHIVO_PARQUET, ns=(version_nueva, version_nueva))
 
 
 @st.cache_data
 def cargar_datos() -> pd.DataFrame:
     """
-    Carga los datos del archivo CSV y los convierte en DataFrame de pandas.
+    Carga los datos del dataset Parquet y los convierte en DataFrame de pandas.
+
+    Si todavía no existe el Parquet, se genera una única vez a partir del
+    CSV original; las cargas siguientes leen el formato binario columnar
+    (sin tokenizar texto ni convertir tipos).
     """
     try:
-        df = pd.read_csv(ARCHIVO_CSV, encoding='utf-8')
-        # Asegurar tipos de datos correctos
-        df['id'] = df['id'].astype(int)
-        df['precio'] = df['precio'].astype(int)
-        df['stock'] = df['stock'].astype(int)
+        if os.path.isfile(ARCHIVO_PARQUET):
+            # Migración: versiones anteriores guardaban un único archivo
+            df_viejo = pd.read_parquet(ARCHIVO_PARQUET, engine="pyarrow")
+            os.remove(ARCHIVO_PARQUET)
+            _escribir_dataset(_df_a_tabla(df_viejo), "delete_matching")
+        elif not os.path.exists(ARCHIVO_PARQUET):
+            # Conversión única CSV -> Parquet
+            df_csv = pd.read_csv(ARCHIVO_CSV, dtype=DTYPES_CSV, encoding='utf-8')
+            _escribir_dataset(_df_a_tabla(df_csv), "delete_matching")
+        # dtype_backend="pyarrow" mantiene las columnas como arreglos Arrow:
+        # cadenas más rápidas de hashear y sin reconversión al enviar las
+        # tablas al navegador (Streamlit ya serializa en Arrow)
+        df = pd.read_parquet(
+            ARCHIVO_PARQUET, engine="pyarrow", columns=COLUMNAS,
+            dtype_backend="pyarrow"
+        )
+        # Los fragmentos del dataset se leen en orden de nombre de archivo,
+        # que es arbitrario: restablecer el orden por id tras la lectura
+        df = df.sort_values('id', ignore_index=True)
+        # Garantizar el dtype categórico aunque el Parquet provenga de una
+        # versión anterior que guardaba cadenas simples
+        for col in ('categoria', 'proveedor'):
+            df[col] = df[col].astype('category')
+        # Columna derivada precio*stock, calculada una sola vez y en int64
+        # para evitar desbordes; la usan las métricas y los análisis
+        df['valor'] = df['precio'].astype('int64') * df['stock'].astype('int64')
+        # Versión de los datos para las cachés derivadas: st.cache_data
+        # devuelve una copia nueva en cada llamada, así que la identidad
+        # estable viene del mtime del dataset, que solo cambia al escribir
+        df.attrs['version'] = os.stat(ARCHIVO_PARQUET).st_mtime_ns
         return df
     except FileNotFoundError:
         st.error(f"❌ No se encontró el archivo '{ARCHIVO_CSV}'")
@@ -101,15 +199,201 @@ def cargar_datos() -> pd.DataFrame:
 
 
 def guardar_datos(df: pd.DataFrame):
-    """Guarda el DataFrame en el archivo CSV."""
+    """Reescribe el dataset Parquet completo (sin columnas derivadas)."""
+    try:
+        _escribir_dataset(_df_a_tabla(df), "delete_matching")
+        return True
+    except Exception as e:
+        st.error(f"❌ Error al guardar: {e}")
+        return False
+
+
+def agregar_producto(producto: dict):
+    """
+    Agrega un producto escribiendo un único fragmento nuevo al dataset,
+    sin reescribir las filas existentes.
+    """
     try:
-        df.to_csv(ARCHIVO_CSV, index=False, encoding='utf-8')
+        tabla = pa.Table.from_pylist([producto], schema=ESQUEMA_PARQUET)
+        _escribir_dataset(tabla, "overwrite_or_ignore")
         return True
     except Exception as e:
         st.error(f"❌ Error al guardar: {e}")
         return False
 
 
+def _version_de_datos(df: pd.DataFrame) -> int:
+    """
+    Clave de caché estable para los DataFrames de `cargar_datos`: las
+    copias que devuelve `st.cache_data` cambian de identidad en cada
+    rerun, pero comparten la versión estampada al cargar.
+    """
+    return df.attrs['version']
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _mascara_stock_bajo(df: pd.DataFrame):
+    """
+    Máscara booleana de productos con stock bajo, calculada una sola vez
+    por versión de los datos: varias páginas la necesitan en cada
+    renderizado.
+    """
+    return (df['stock'] <= UMBRAL_STOCK_BAJO).to_numpy()
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _nombres_minusculas(df: pd.DataFrame) -> pd.Series:
+    """Columna de nombres en minúsculas, precalculada para la búsqueda."""
+    return df['nombre'].str.lower()
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _orden_por_precio(df: pd.DataFrame):
+    """Vista ordenada por precio y su columna como arreglo de NumPy."""
+    df_ordenado = df.sort_values('precio', kind='stable')
+    return df_ordenado, df_ordenado['precio'].to_numpy()
+
+
+@st.cache_data(max_entries=32, show_spinner=False, hash_funcs={pd.DataFrame: _version_de_datos})
+def _aplicar_filtros(df: pd.DataFrame, categoria: str, proveedor: str,
+                     precio_min: int, precio_max: int,
+                     stock_filter: str, busqueda: str) -> pd.DataFrame:
+    """
+    Aplica los filtros de la página de productos y cachea el resultado,
+    de modo que repetir una combinación de filtros no vuelva a recorrer
+    el DataFrame completo. El DataFrame se identifica por su versión de
+    datos, que solo cambia cuando se escribe el dataset.
+    """
+    # El rango de precio va primero: sobre la vista ordenada cacheada se
+    # resuelve con dos búsquedas binarias y un corte, sin materializar
+    # máscaras booleanas; el resto de los filtros opera sobre el recorte
+    df_ordenado, precios = _orden_por_precio(df)
+    inicio = np.searchsorted(precios, precio_min, side='left')
+    fin = np.searchsorted(precios, precio_max, side='right')
+    df_filtrado = df_ordenado.iloc[inicio:fin]
+
+    if stock_filter == "Stock Bajo (≤20)":
+        df_filtrado = df_filtrado[df_filtrado['stock'] <= UMBRAL_STOCK_BAJO]
+    elif stock_filter == "Stock Saludable (>20)":
+        df_filtrado = df_filtrado[df_filtrado['stock'] > UMBRAL_STOCK_BAJO]
+
+    if categoria != 'Todas':
+        df_filtrado = df_filtrado[df_filtrado['categoria'] == categoria]
+
+    if proveedor != 'Todos':
+        df_filtrado = df_filtrado[df_filtrado['proveedor'] == proveedor]
+
+    if busqueda:
+        # Subcadena simple sobre los nombres ya pasados a minúsculas:
+        # sin compilar una expresión regular ni plegar mayúsculas por fila.
+        # La máscara cubre todo el DataFrame; se alinea explícitamente al
+        # recorte ya filtrado para no depender del reindexado implícito
+        coincide = _nombres_minusculas(df).str.contains(
+            busqueda.lower(), regex=False, na=False
+        )
+        df_filtrado = df_filtrado[coincide.loc[df_filtrado.index].to_numpy(dtype=bool)]
+
+    # Restaurar el orden original (por id) para la tabla de resultados
+    return df_filtrado.sort_index()
+
+
+@st.cache_data(max_entries=8, hash_funcs={pd.DataFrame: _version_de_datos})
+def _conteo_por_columna(df: pd.DataFrame, col: str) -> pd.Series:
+    """Conteo de productos por valor de una columna, para los gráficos."""
+    return df[col].value_counts()
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _distribucion_precios(df: pd.DataFrame) -> pd.Series:
+    """Conteo de productos por franja de precio."""
+    franjas = pd.cut(df['precio'], bins=[0, 500, 2000, 10000],
+                     labels=['Económico (<500)', 'Medio (500-2000)', 'Premium (>2000)'])
+    return franjas.value_counts()
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _top5_valor(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Los cinco productos de mayor valor de inventario, por selección
+    parcial O(N) en lugar de ordenar todas las filas.
+    """
+    valores = df['valor'].to_numpy()
+    n = min(5, len(valores))
+    indices = np.argpartition(valores, len(valores) - n)[-n:]
+    indices = indices[np.argsort(-valores[indices])]
+    return df.iloc[indices][['nombre', 'valor']].set_index('nombre')
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _resumen_por_categoria(df: pd.DataFrame) -> pd.DataFrame:
+    """Tabla agregada por categoría, cacheada hasta la próxima escritura."""
+    return df.groupby('categoria').agg({
+        'id': 'count',
+        'stock': 'sum',
+        'precio': 'mean',
+        'valor': 'sum'
+    }).rename(columns={
+        'id': 'Cantidad Productos',
+        'stock': 'Stock Total',
+        'precio': 'Precio Promedio',
+        'valor': 'Valor Total'
+    })
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _resumen_por_proveedor(df: pd.DataFrame) -> pd.DataFrame:
+    """Tabla agregada por proveedor, cacheada hasta la próxima escritura."""
+    resumen = df.groupby('proveedor').agg({
+        'id': 'count',
+        'stock': 'sum',
+        'categoria': 'nunique',
+        'valor': 'sum'
+    }).rename(columns={
+        'id': 'Productos',
+        'stock': 'Stock Total',
+        'categoria': 'Categorías',
+        'valor': 'Valor Total'
+    })
+    return resumen.sort_values('Productos', ascending=False)
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _kpis(df: pd.DataFrame) -> tuple:
+    """
+    Indicadores globales (productos, stock, valor, categorías, proveedores),
+    sumados una sola vez por DataFrame: los usan el panel de métricas,
+    la barra lateral y la página de estadísticas en cada renderizado.
+    """
+    return (
+        len(df),
+        int(df['stock'].sum()),
+        int(df['valor'].sum()),
+        df['categoria'].nunique(),
+        df['proveedor'].nunique(),
+    )
+
+
+@st.cache_data(max_entries=8, hash_funcs={pd.DataFrame: _version_de_datos})
+def _valores_unicos_ordenados(df: pd.DataFrame, col: str) -> list:
+    """Lista ordenada de valores únicos de una columna, para selectboxes."""
+    serie = df[col]
+    if hasattr(serie, 'cat'):
+        return serie.cat.categories.sort_values().tolist()
+    return sorted(serie.unique().tolist())
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _nombre_a_id(df: pd.DataFrame) -> dict:
+    """Mapa nombre -> id para el selector de productos."""
+    return dict(zip(df['nombre'], df['id']))
+
+
+@st.cache_data(max_entries=4, hash_funcs={pd.DataFrame: _version_de_datos})
+def _indice_por_id(df: pd.DataFrame) -> pd.DataFrame:
+    """Vista del DataFrame indexada por id para búsquedas O(1) con .loc."""
+    return df.set_index('id', drop=False)
+
+
 def mostrar_header():
     """Muestra el encabezado principal de la aplicación."""
     st.markdown(
@@ -120,39 +404,37 @@ def mostrar_header():
 
 def mostrar_metricas_principales(df: pd.DataFrame):
     """Muestra las métricas principales en tarjetas."""
+    total_productos, stock_total, valor_total, categorias, _ = _kpis(df)
     col1, col2, col3, col4, col5 = st.columns(5)
-    
+
     with col1:
         st.metric(
             label="📦 Total Productos",
-            value=len(df)
+            value=total_productos
         )
-    
+
     with col2:
-        stock_total = df['stock'].sum()
         st.metric(
             label="📊 Stock Total",
             value=f"{stock_total:,}",
             help="Unidades totales en inventario"
         )
-    
+
     with col3:
-        valor_total = (df['precio'] * df['stock']).sum()
         st.metric(
             label="💰 Valor Inventario",
             value=f"{valor_total:,}",
             help="Monedas de oro"
         )
-    
+
     with col4:
-        categorias = df['categoria'].nunique()
         st.metric(
             label="🏷️ Categorías",
             value=categorias
         )
-    
+
     with col5:
-        productos_bajo_stock = len(df[df['stock'] <= UMBRAL_STOCK_BAJO])
+        productos_bajo_stock = int(_mascara_stock_bajo(df).sum())
         st.metric(
             label="⚠️ Stock Bajo",
             value=productos_bajo_stock,
@@ -173,33 +455,27 @@ def pagina_inicio(df: pd.DataFrame):
     # Dos columnas para gráficos
     col1, col2 = st.columns(2)
     
+    # Los datos de los cuatro gráficos se cachean: no cambian entre páginas
     with col1:
         st.subheader("📈 Productos por Categoría")
-        categoria_counts = df['categoria'].value_counts()
-        st.bar_chart(categoria_counts)
-        
+        st.bar_chart(_conteo_por_columna(df, 'categoria'))
+
         st.subheader("💵 Distribución de Precios")
-        precio_dist = pd.cut(df['precio'], bins=[0, 500, 2000, 10000], 
-                            labels=['Económico (<500)', 'Medio (500-2000)', 'Premium (>2000)'])
-        st.bar_chart(precio_dist.value_counts())
-    
+        st.bar_chart(_distribucion_precios(df))
+
     with col2:
         st.subheader("🏪 Productos por Proveedor")
-        proveedor_counts = df['proveedor'].value_counts()
-        st.bar_chart(proveedor_counts)
-        
+        st.bar_chart(_conteo_por_columna(df, 'proveedor'))
+
         st.subheader("💎 Top 5 Más Valiosos")
-        df_valor = df.copy()
-        df_valor['valor_total'] = df_valor['precio'] * df_valor['stock']
-        top5 = df_valor.nlargest(5, 'valor_total')[['nombre', 'valor_total']]
-        top5 = top5.set_index('nombre')
-        st.bar_chart(top5)
+        st.bar_chart(_top5_valor(df))
     
     # Alerta de productos con stock bajo
-    if len(df[df['stock'] <= UMBRAL_STOCK_BAJO]) > 0:
+    mascara_bajo = _mascara_stock_bajo(df)
+    if mascara_bajo.any():
         st.markdown("---")
         st.warning("⚠️ **ALERTA: Productos con Stock Bajo**")
-        productos_criticos = df[df['stock'] <= UMBRAL_STOCK_BAJO].sort_values('stock')
+        productos_criticos = df[mascara_bajo].sort_values('stock')
         st.dataframe(
             productos_criticos[['nombre', 'categoria', 'stock', 'proveedor']],
             use_container_width=True,
@@ -215,11 +491,11 @@ def pagina_productos(df: pd.DataFrame):
     st.sidebar.subheader("🎛️ Filtros")
     
     # Filtro por categoría
-    categorias = ['Todas'] + sorted(df['categoria'].unique().tolist())
+    categorias = ['Todas'] + _valores_unicos_ordenados(df, 'categoria')
     categoria_seleccionada = st.sidebar.selectbox("Categoría", categorias)
-    
+
     # Filtro por proveedor
-    proveedores = ['Todos'] + sorted(df['proveedor'].unique().tolist())
+    proveedores = ['Todos'] + _valores_unicos_ordenados(df, 'proveedor')
     proveedor_seleccionado = st.sidebar.selectbox("Proveedor", proveedores)
     
     # Filtro por rango de precio
@@ -239,40 +515,27 @@ def pagina_productos(df: pd.DataFrame):
     # Búsqueda por nombre
     busqueda = st.sidebar.text_input("🔎 Buscar por nombre", "")
     
-    # Aplicar filtros
-    df_filtrado = df.copy()
-    
-    if categoria_seleccionada != 'Todas':
-        df_filtrado = df_filtrado[df_filtrado['categoria'] == categoria_seleccionada]
-    
-    if proveedor_seleccionado != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['proveedor'] == proveedor_seleccionado]
-    
-    df_filtrado = df_filtrado[
-        (df_filtrado['precio'] >= precio_min) & 
-        (df_filtrado['precio'] <= precio_max)
-    ]
-    
-    if stock_filter == "Stock Bajo (≤20)":
-        df_filtrado = df_filtrado[df_filtrado['stock'] <= UMBRAL_STOCK_BAJO]
-    elif stock_filter == "Stock Saludable (>20)":
-        df_filtrado = df_filtrado[df_filtrado['stock'] > UMBRAL_STOCK_BAJO]
-    
-    if busqueda:
-        df_filtrado = df_filtrado[
-            df_filtrado['nombre'].str.contains(busqueda, case=False, na=False)
-        ]
-    
+    # Aplicar filtros (cacheado por combinación de filtros)
+    df_filtrado = _aplicar_filtros(
+        df, categoria_seleccionada, proveedor_seleccionado,
+        precio_min, precio_max, stock_filter, busqueda
+    )
+
     # Mostrar resultados
     st.subheader(f"📦 Resultados: {len(df_filtrado)} producto(s)")
     
     if len(df_filtrado) > 0:
-        # Agregar columna de estado de stock
-        df_display = df_filtrado.copy()
-        df_display['Estado'] = df_display['stock'].apply(
-            lambda x: '⚠️ BAJO' if x <= UMBRAL_STOCK_BAJO else '✅ OK'
+        # Agregar columna de estado de stock sin copiar todo el DataFrame:
+        # np.where etiqueta todas las filas en una sola pasada vectorizada
+        # y assign solo materializa la columna nueva
+        estados = np.where(
+            df_filtrado['stock'].to_numpy() <= UMBRAL_STOCK_BAJO,
+            '⚠️ BAJO', '✅ OK'
         )
-        
+        df_display = df_filtrado.assign(
+            Estado=pd.Categorical(estados, categories=['⚠️ BAJO', '✅ OK'])
+        )
+
         # Mostrar tabla
         st.dataframe(
             df_display[['id', 'nombre', 'categoria', 'precio', 'stock', 'Estado', 'proveedor', 'descripcion']],
@@ -285,11 +548,20 @@ def pagina_productos(df: pd.DataFrame):
         with col1:
             st.metric("Stock Total", f"{df_filtrado['stock'].sum():,}")
         with col2:
-            valor = (df_filtrado['precio'] * df_filtrado['stock']).sum()
+            valor = df_filtrado['valor'].sum()
             st.metric("Valor Total", f"{valor:,} 💰")
         with col3:
             precio_prom = df_filtrado['precio'].mean()
             st.metric("Precio Promedio", f"{precio_prom:.0f} 💰")
+
+        # Exportación en texto plano para quien siga necesitando el CSV,
+        # con las columnas originales (sin las derivadas)
+        st.download_button(
+            "⬇️ Exportar resultados a CSV",
+            df_filtrado[COLUMNAS].to_csv(index=False).encode('utf-8'),
+            file_name="tienda_aurelion.csv",
+            mime="text/csv"
+        )
     else:
         st.info("No se encontraron productos con los filtros seleccionados.")
 
@@ -301,24 +573,24 @@ def pagina_estadisticas(df: pd.DataFrame):
     # Estadísticas generales
     st.subheader("📈 Estadísticas Generales")
     
+    total_productos, stock_total, valor_total, categorias, proveedores = _kpis(df)
     col1, col2, col3, col4 = st.columns(4)
-    
+
     with col1:
-        st.metric("Total Productos", len(df))
-        st.metric("Categorías Únicas", df['categoria'].nunique())
-    
+        st.metric("Total Productos", total_productos)
+        st.metric("Categorías Únicas", categorias)
+
     with col2:
-        st.metric("Stock Total", f"{df['stock'].sum():,}")
+        st.metric("Stock Total", f"{stock_total:,}")
         st.metric("Stock Promedio", f"{df['stock'].mean():.1f}")
-    
+
     with col3:
-        valor_total = (df['precio'] * df['stock']).sum()
         st.metric("Valor Total", f"{valor_total:,} 💰")
         st.metric("Precio Promedio", f"{df['precio'].mean():.0f} 💰")
-    
+
     with col4:
-        st.metric("Proveedores Únicos", df['proveedor'].nunique())
-        productos_bajo = len(df[df['stock'] <= UMBRAL_STOCK_BAJO])
+        st.metric("Proveedores Únicos", proveedores)
+        productos_bajo = int(_mascara_stock_bajo(df).sum())
         st.metric("Productos Stock Bajo", productos_bajo)
     
     st.markdown("---")
@@ -326,26 +598,17 @@ def pagina_estadisticas(df: pd.DataFrame):
     # Análisis por categoría
     st.subheader("🏷️ Análisis por Categoría")
     
-    analisis_categoria = df.groupby('categoria').agg({
-        'id': 'count',
-        'stock': 'sum',
-        'precio': 'mean'
-    }).rename(columns={
-        'id': 'Cantidad Productos',
-        'stock': 'Stock Total',
-        'precio': 'Precio Promedio'
-    })
-    
-    analisis_categoria['Valor Total'] = df.groupby('categoria').apply(
-        lambda x: (x['precio'] * x['stock']).sum()
-    )
-    
+    analisis_categoria = _resumen_por_categoria(df)
+
+    # El formato se aplica en el navegador vía column_config: viaja la tabla
+    # numérica cruda más una especificación, sin pasar por un Styler
     st.dataframe(
-        analisis_categoria.style.format({
-            'Stock Total': '{:,.0f}',
-            'Precio Promedio': '{:,.0f} 💰',
-            'Valor Total': '{:,.0f} 💰'
-        }),
+        analisis_categoria,
+        column_config={
+            'Stock Total': st.column_config.NumberColumn(format="%,.0f"),
+            'Precio Promedio': st.column_config.NumberColumn(format="%,.0f 💰"),
+            'Valor Total': st.column_config.NumberColumn(format="%,.0f 💰")
+        },
         use_container_width=True
     )
     
@@ -354,27 +617,14 @@ def pagina_estadisticas(df: pd.DataFrame):
     # Análisis por proveedor
     st.subheader("🏪 Análisis por Proveedor")
     
-    analisis_proveedor = df.groupby('proveedor').agg({
-        'id': 'count',
-        'stock': 'sum',
-        'categoria': lambda x: x.nunique()
-    }).rename(columns={
-        'id': 'Productos',
-        'stock': 'Stock Total',
-        'categoria': 'Categorías'
-    })
-    
-    analisis_proveedor['Valor Total'] = df.groupby('proveedor').apply(
-        lambda x: (x['precio'] * x['stock']).sum()
-    )
-    
-    analisis_proveedor = analisis_proveedor.sort_values('Productos', ascending=False)
+    analisis_proveedor = _resumen_por_proveedor(df)
     
     st.dataframe(
-        analisis_proveedor.style.format({
-            'Stock Total': '{:,.0f}',
-            'Valor Total': '{:,.0f} 💰'
-        }),
+        analisis_proveedor,
+        column_config={
+            'Stock Total': st.column_config.NumberColumn(format="%,.0f"),
+            'Valor Total': st.column_config.NumberColumn(format="%,.0f 💰")
+        },
         use_container_width=True
     )
     
@@ -420,13 +670,13 @@ def pagina_gestionar(df: pd.DataFrame):
             
             with col1:
                 nombre = st.text_input("📦 Nombre del Producto *")
-                categorias = sorted(df['categoria'].unique().tolist())
+                categorias = _valores_unicos_ordenados(df, 'categoria')
                 categoria = st.selectbox("🏷️ Categoría", categorias)
                 precio = st.number_input("💰 Precio (monedas)", min_value=1, value=100)
             
             with col2:
                 stock = st.number_input("📊 Stock Inicial", min_value=0, value=10)
-                proveedores = sorted(df['proveedor'].unique().tolist())
+                proveedores = _valores_unicos_ordenados(df, 'proveedor')
                 proveedor = st.selectbox("🏪 Proveedor", proveedores)
                 descripcion = st.text_area("📝 Descripción *")
             
@@ -436,8 +686,8 @@ def pagina_gestionar(df: pd.DataFrame):
                 if not nombre or not descripcion:
                     st.error("❌ El nombre y la descripción son obligatorios")
                 else:
-                    nuevo_id = df['id'].max() + 1
-                    nuevo_producto = pd.DataFrame([{
+                    nuevo_id = int(df['id'].max()) + 1
+                    nuevo_producto = {
                         'id': nuevo_id,
                         'nombre': nombre,
                         'categoria': categoria,
@@ -445,28 +695,29 @@ def pagina_gestionar(df: pd.DataFrame):
                         'stock': stock,
                         'descripcion': descripcion,
                         'proveedor': proveedor
-                    }])
-                    
-                    df_actualizado = pd.concat([df, nuevo_producto], ignore_index=True)
-                    
-                    if guardar_datos(df_actualizado):
+                    }
+
+                    if agregar_producto(nuevo_producto):
                         st.success(f"✅ Producto '{nombre}' agregado exitosamente con ID {nuevo_id}")
-                        st.cache_data.clear()
+                        # Invalidación dirigida: al recargar, el DataFrame nuevo
+                        # tiene otra identidad y los cachés derivados (filtros,
+                        # agregaciones, KPIs) se recalculan solos
+                        cargar_datos.clear()
                         st.rerun()
     
     with tab2:
         st.subheader("Actualizar Stock de Producto")
         
-        # Selector de producto
-        productos_dict = dict(zip(df['nombre'], df['id']))
+        # Selector de producto (mapa y vista indexada cacheados por DataFrame)
+        productos_dict = _nombre_a_id(df)
         producto_seleccionado = st.selectbox(
             "Selecciona un producto",
             options=list(productos_dict.keys())
         )
-        
+
         if producto_seleccionado:
             producto_id = productos_dict[producto_seleccionado]
-            producto = df[df['id'] == producto_id].iloc[0]
+            producto = _indice_por_id(df).loc[producto_id]
             
             st.info(f"""
             **Información actual:**
@@ -509,12 +760,15 @@ def pagina_gestionar(df: pd.DataFrame):
                             st.success(f"✅ {mensaje}. Nuevo stock: {nuevo_stock} unidades")
                             if nuevo_stock <= UMBRAL_STOCK_BAJO:
                                 st.warning("⚠️ ADVERTENCIA: Stock bajo. Considerar reabastecimiento.")
-                            st.cache_data.clear()
+                            cargar_datos.clear()
                             st.rerun()
 
 
 def main():
     """Función principal de la aplicación."""
+    # Estilos (cacheados tras el primer rerun)
+    _inyectar_css()
+
     # Cargar datos
     df = cargar_datos()
     
@@ -532,12 +786,13 @@ def main():
         ["🏠 Inicio", "🔍 Explorar Productos", "📊 Estadísticas", "✏️ Gestionar Inventario"]
     )
     
+    total_productos, stock_total, valor_total, _, _ = _kpis(df)
     st.sidebar.markdown("---")
     st.sidebar.info(f"""
     **📊 Resumen Rápido**
-    - Total productos: **{len(df)}**
-    - Stock total: **{df['stock'].sum():,}**
-    - Valor inventario: **{(df['precio'] * df['stock']).sum():,} 💰**
+    - Total productos: **{total_productos}**
+    - Stock total: **{stock_total:,}**
+    - Valor inventario: **{valor_total:,} 💰**
     """)
     
     # Mostrar página seleccionada